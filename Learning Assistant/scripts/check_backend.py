@@ -0,0 +1,80 @@
+import argparse
+import json
+import time
+
+from src.llm_tutor.config import settings
+from src.llm_tutor.inference import check_parity, load_cross_encoder, load_embedder, predict_pairs
+from src.llm_tutor.ingestion import list_source_files, load_file
+
+
+def sample_texts(source_dir: str, limit: int) -> list:
+    embedder = load_embedder("torch")
+    texts = []
+    for path in list_source_files(source_dir):
+        texts.extend(c.text for c in load_file(path, embedder))
+        if len(texts) >= limit:
+            break
+    return texts[:limit]
+
+
+def benchmark(backend: str, texts: list, query: str, rounds: int) -> dict:
+    embedder = load_embedder(backend)
+    cross_encoder = load_cross_encoder(backend)
+    pairs = [[query, t] for t in texts[: settings.top_k]]
+    embedder.encode(texts[:8], show_progress_bar=False)
+    predict_pairs(cross_encoder, pairs)
+
+    start = time.perf_counter()
+    embedder.encode(texts, show_progress_bar=False)
+    embed_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        predict_pairs(cross_encoder, pairs)
+    rerank_ms = (time.perf_counter() - start) / rounds * 1000
+
+    return {
+        "backend": backend,
+        "embed_chunks_per_sec": round(len(texts) / embed_seconds, 1) if embed_seconds else None,
+        "rerank_ms_per_query": round(rerank_ms, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Check parity and speed of the CPU inference backend")
+    parser.add_argument("--source", default="./data/source", help="Directory with documents to sample chunks from")
+    parser.add_argument("--backend", default=settings.inference_backend, help="torch, onnx or int8")
+    parser.add_argument("--query", default="Explain the main idea of this lecture.")
+    parser.add_argument("--limit", type=int, default=256, help="Number of chunks to sample")
+    parser.add_argument("--rounds", type=int, default=20, help="Rerank rounds to average latency over")
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    parser.add_argument(
+        "--score-tolerance",
+        type=float,
+        default=0.1,
+        help="Reranker score gap below which reordered pairs count as ties",
+    )
+    args = parser.parse_args()
+
+    texts = sample_texts(args.source, args.limit)
+    if not texts:
+        raise SystemExit(f"No chunks found in {args.source}.")
+
+    parity = check_parity(
+        texts,
+        args.query,
+        backend=args.backend,
+        min_cosine=args.min_cosine,
+        score_tolerance=args.score_tolerance,
+    )
+    print(json.dumps(parity, indent=2))
+    print(json.dumps(benchmark("torch", texts, args.query, args.rounds), indent=2))
+    if args.backend != "torch":
+        print(json.dumps(benchmark(args.backend, texts, args.query, args.rounds), indent=2))
+
+    if not (parity["embeddings_match"] and parity["ranking_match"]):
+        raise SystemExit("Backend output differs from the reference models beyond tolerance.")
+
+
+if __name__ == "__main__":
+    main()
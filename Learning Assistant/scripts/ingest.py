@@ -8,7 +8,10 @@ def main() -> None:
     parser.add_argument("--source", default="./data/source", help="Directory with PDF/MD/TXT/PNG/JPG files")
     args = parser.parse_args()
 
-    total = ingest(args.source)
+    def report(done: int, total: int, message: str) -> None:
+        print(f"[{done}/{total}] {message}")
+
+    total = ingest(args.source, progress=report)
     print(f"Ingested {total} chunks.")
 
 
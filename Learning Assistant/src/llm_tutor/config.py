@@ -13,7 +13,17 @@ class Settings:
     embedding_model: str = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
     chroma_dir: str = os.getenv("CHROMA_DIR", "./data/chroma")
     bm25_index_path: str = os.getenv("BM25_INDEX_PATH", "./data/bm25_index.pkl")
+    index_root: str = os.getenv("INDEX_ROOT", "./data/indexes")
+    index_keep_versions: int = int(os.getenv("INDEX_KEEP_VERSIONS", "2"))
     rerank_model: str = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+    inference_backend: str = os.getenv("INFERENCE_BACKEND", "torch")
+    inference_threads: int = int(os.getenv("INFERENCE_THREADS", "0"))
+    inference_max_seq_length: int = int(os.getenv("INFERENCE_MAX_SEQ_LENGTH", "0"))
+    dedup_enabled: bool = os.getenv("DEDUP_ENABLED", "true").lower() in {"1", "true", "yes"}
+    dedup_threshold: float = float(os.getenv("DEDUP_THRESHOLD", "0.8"))
+    dedup_num_perm: int = int(os.getenv("DEDUP_NUM_PERM", "128"))
+    dedup_bands: int = int(os.getenv("DEDUP_BANDS", "16"))
+    ingest_batch_size: int = int(os.getenv("INGEST_BATCH_SIZE", "64"))
     top_k: int = int(os.getenv("TOP_K", "6"))
     rrf_k: int = int(os.getenv("RRF_K", "60"))
     max_context_chunks: int = int(os.getenv("MAX_CONTEXT_CHUNKS", "5"))
@@ -0,0 +1,156 @@
+import json
+import re
+import zlib
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .config import settings
+
+
+WORD_REGEX = re.compile(r"\w+")
+# Sources kept in a collapsed chunk's metadata (its own first); the full membership
+# lives in the sparse store, and duplicate_count holds the total.
+MAX_LISTED_SOURCES = 4
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+@dataclass
+class DedupStats:
+    chunks_before: int = 0
+    chunks_after: int = 0
+    clusters: int = 0
+    bytes_before: int = 0
+    bytes_after: int = 0
+
+    @property
+    def duplicates_removed(self) -> int:
+        return self.chunks_before - self.chunks_after
+
+    @property
+    def savings_ratio(self) -> float:
+        if not self.chunks_before:
+            return 0.0
+        return self.duplicates_removed / self.chunks_before
+
+    def to_dict(self) -> Dict:
+        return {
+            **asdict(self),
+            "duplicates_removed": self.duplicates_removed,
+            "savings_ratio": round(self.savings_ratio, 4),
+        }
+
+
+def shingles(text: str, size: int = 3) -> List[str]:
+    words = WORD_REGEX.findall(text.lower())
+    if len(words) <= size:
+        return [" ".join(words)] if words else []
+    return [" ".join(words[i : i + size]) for i in range(len(words) - size + 1)]
+
+
+class MinHasher:
+    def __init__(self, num_perm: Optional[int] = None, seed: int = 1) -> None:
+        self.num_perm = num_perm or settings.dedup_num_perm
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, 1 << 32, size=self.num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, 1 << 32, size=self.num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        grams = shingles(text)
+        if not grams:
+            return np.full(self.num_perm, MAX_HASH, dtype=np.uint64)
+        hashes = np.array([zlib.crc32(g.encode("utf-8")) for g in set(grams)], dtype=np.uint64)
+        # Universal hashing (a * x + b) mod p; uint64 overflow wraps, as in the usual MinHash trick.
+        permuted = (np.outer(hashes, self.a) + self.b) % MERSENNE_PRIME & MAX_HASH
+        return permuted.min(axis=0)
+
+
+def band_keys(signature: np.ndarray, bands: Optional[int] = None) -> List[bytes]:
+    bands = bands or settings.dedup_bands
+    rows = max(len(signature) // bands, 1)
+    return [signature[band * rows : (band + 1) * rows].tobytes() for band in range(bands)]
+
+
+def estimated_jaccard(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+    return float((sig_a == sig_b).mean())
+
+
+def find_duplicate_clusters(
+    texts: List[str],
+    threshold: Optional[float] = None,
+    bands: Optional[int] = None,
+    hasher: Optional[MinHasher] = None,
+) -> List[List[int]]:
+    # Returns groups of indices whose texts are near-duplicates, each in input order.
+    # LSH banding proposes candidate pairs; the MinHash estimate then confirms them.
+    threshold = settings.dedup_threshold if threshold is None else threshold
+    bands = bands or settings.dedup_bands
+    hasher = hasher or MinHasher()
+
+    signatures = [hasher.signature(t) for t in texts]
+    parent = list(range(len(texts)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    keys = [band_keys(sig, bands) for sig in signatures]
+    for band in range(bands):
+        buckets: Dict[bytes, List[int]] = {}
+        for i, sig_keys in enumerate(keys):
+            buckets.setdefault(sig_keys[band], []).append(i)
+        for members in buckets.values():
+            if len(members) < 2:
+                continue
+            first = members[0]
+            for other in members[1:]:
+                root_a, root_b = find(first), find(other)
+                if root_a == root_b:
+                    continue
+                if estimated_jaccard(signatures[first], signatures[other]) >= threshold:
+                    parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    clusters: Dict[int, List[int]] = {}
+    for i in range(len(texts)):
+        clusters.setdefault(find(i), []).append(i)
+    return list(clusters.values())
+
+
+def unique_indices(texts: List[str], threshold: Optional[float] = None) -> List[int]:
+    # Index of the first (best-ranked) member of each near-duplicate cluster, in order.
+    return sorted(members[0] for members in find_duplicate_clusters(texts, threshold=threshold))
+
+
+def format_source(metadata: Dict) -> str:
+    source = metadata.get("source", "unknown")
+    page = metadata.get("page")
+    return f"{source}#page={page}" if page is not None else source
+
+
+def chunk_sources(metadata: Dict) -> List[str]:
+    # Chroma only stores scalar metadata, so collapsed chunks keep a short preview of
+    # their sources as JSON.
+    raw = metadata.get("sources")
+    if raw:
+        try:
+            return json.loads(raw)
+        except (TypeError, json.JSONDecodeError):
+            pass
+    return [format_source(metadata)]
+
+
+def other_sources_label(metadata: Dict, limit: int = 3) -> str:
+    # "a, b, c and N more" for the sources a collapsed chunk stands in for, or "".
+    others = chunk_sources(metadata)[1:]
+    total_others = max(int(metadata.get("duplicate_count") or 1) - 1, len(others))
+    if not total_others:
+        return ""
+    shown = others[:limit]
+    label = ", ".join(shown)
+    if total_others > len(shown):
+        label += f" and {total_others - len(shown)} more"
+    return label
@@ -0,0 +1,207 @@
+import os
+import shutil
+import time
+import uuid
+from dataclasses import dataclass
+from typing import IO, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+    import msvcrt
+
+from .config import settings
+
+
+CURRENT_POINTER = "CURRENT"
+VERSION_PREFIX = "v"
+PUBLISHED_MARKER = "PUBLISHED"
+LOCK_FILE = "BUILD.lock"
+
+
+@dataclass
+class IndexPaths:
+    chroma_dir: str
+    bm25_index_path: str
+    report_path: Optional[str] = None
+
+
+def version_paths(version_dir: str) -> IndexPaths:
+    return IndexPaths(
+        chroma_dir=os.path.join(version_dir, "chroma"),
+        bm25_index_path=os.path.join(version_dir, "bm25_index.sqlite"),
+        report_path=os.path.join(version_dir, "ingest_report.json"),
+    )
+
+
+def list_versions() -> List[str]:
+    if not os.path.isdir(settings.index_root):
+        return []
+    names = [
+        name
+        for name in os.listdir(settings.index_root)
+        if name.startswith(VERSION_PREFIX) and os.path.isdir(os.path.join(settings.index_root, name))
+    ]
+    # Version names start with a zero-padded, strictly increasing timestamp, so lexical
+    # order is creation order.
+    return sorted(names)
+
+
+class VersionLock:
+    # Exclusive OS-level lock on a version directory, held by the process building it.
+    # The OS drops it when that process dies, so a crashed build becomes resumable.
+
+    def __init__(self, version_dir: str) -> None:
+        self.version_dir = version_dir
+        self._file: Optional[IO] = None
+
+    def acquire(self, blocking: bool = False) -> bool:
+        f = open(os.path.join(self.version_dir, LOCK_FILE), "a+b")
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+        except OSError:
+            f.close()
+            return False
+        self._file = f
+        return True
+
+    def release(self) -> None:
+        if self._file is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            else:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._file.close()
+            self._file = None
+
+
+def is_published(version_dir: str) -> bool:
+    return os.path.exists(os.path.join(version_dir, PUBLISHED_MARKER))
+
+
+def published_at(version_dir: str) -> int:
+    # UTC nanoseconds recorded by publish_version; 0 if the marker is missing or unreadable.
+    try:
+        with open(os.path.join(version_dir, PUBLISHED_MARKER), "r", encoding="utf-8") as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return 0
+
+
+def _version_timestamp(name: str) -> int:
+    try:
+        return int(name[len(VERSION_PREFIX):].split("-", 1)[0])
+    except ValueError:
+        return 0
+
+
+def current_version() -> Optional[str]:
+    pointer = os.path.join(settings.index_root, CURRENT_POINTER)
+    try:
+        with open(pointer, "r", encoding="utf-8") as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return None
+    if name and os.path.isdir(os.path.join(settings.index_root, name)):
+        return name
+    return None
+
+
+def pending_versions() -> List[str]:
+    # Unpublished version directories newer than the current one: builds in progress or
+    # interrupted. Callers must take the VersionLock before writing into one.
+    current = current_version()
+    paths = [
+        os.path.join(settings.index_root, name)
+        for name in list_versions()
+        if current is None or name > current
+    ]
+    return [path for path in paths if not is_published(path)]
+
+
+def active_paths() -> IndexPaths:
+    version = current_version()
+    if version is None:
+        # No published version yet: fall back to the legacy single-directory layout.
+        return IndexPaths(chroma_dir=settings.chroma_dir, bm25_index_path=settings.bm25_index_path)
+    return version_paths(os.path.join(settings.index_root, version))
+
+
+def create_staging_version() -> str:
+    # Builds go into a fresh version directory; readers only see it once published.
+    # Named by UTC nanoseconds, bumped past every existing version so the order holds
+    # even if the clock steps backwards.
+    existing = [_version_timestamp(name) for name in list_versions()]
+    stamp = max([time.time_ns()] + [ts + 1 for ts in existing])
+    name = f"{VERSION_PREFIX}{stamp:020d}-{uuid.uuid4().hex[:8]}"
+    path = os.path.join(settings.index_root, name)
+    os.makedirs(path)
+    return path
+
+
+def publish_version(version_dir: str) -> None:
+    # Mark the build complete, then write the pointer next to its final location and
+    # swap it in with an atomic rename.
+    with open(os.path.join(version_dir, PUBLISHED_MARKER), "w", encoding="utf-8") as f:
+        f.write(str(time.time_ns()))
+    name = os.path.basename(os.path.normpath(version_dir))
+    pointer = os.path.join(settings.index_root, CURRENT_POINTER)
+    tmp_pointer = f"{pointer}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp_pointer, "w", encoding="utf-8") as f:
+        f.write(name)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_pointer, pointer)
+    gc_versions()
+
+
+def gc_versions(keep: Optional[int] = None) -> List[str]:
+    # Only published versions count towards ``keep``, newest publish first, and the
+    # current one is always kept. Unpublished versions older than the current one are
+    # abandoned builds and are removed unless a build still holds their lock; newer
+    # ones may be resumed and are left alone.
+    keep = settings.index_keep_versions if keep is None else keep
+    current = current_version()
+    if current is None:
+        return []
+    published, abandoned = [], []
+    for name in list_versions():
+        path = os.path.join(settings.index_root, name)
+        if name == current or is_published(path):
+            published.append(name)
+        elif name < current:
+            abandoned.append(name)
+
+    # Builds can finish out of order, so rank by publish time rather than by name.
+    published.sort(key=lambda name: published_at(os.path.join(settings.index_root, name)), reverse=True)
+    retained = {current}
+    for name in published:
+        if len(retained) >= max(keep, 1):
+            break
+        retained.add(name)
+
+    removed = []
+    for name in published:
+        if name in retained:
+            continue
+        # Readers on Windows may still hold files open; whatever survives is retried next time.
+        shutil.rmtree(os.path.join(settings.index_root, name), ignore_errors=True)
+        removed.append(name)
+    for name in abandoned:
+        path = os.path.join(settings.index_root, name)
+        lock = VersionLock(path)
+        if not lock.acquire():
+            continue
+        lock.release()
+        shutil.rmtree(path, ignore_errors=True)
+        removed.append(name)
+    return removed
@@ -0,0 +1,227 @@
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import torch
+from sentence_transformers import CrossEncoder, SentenceTransformer
+from langchain_core.embeddings import Embeddings
+
+try:
+    import onnxruntime
+except Exception:  # pragma: no cover - optional ONNX dependency
+    onnxruntime = None
+
+try:
+    import psutil
+except Exception:  # pragma: no cover - optional, only used to count physical cores
+    psutil = None
+
+from .config import settings
+
+
+BACKENDS = {"torch", "onnx", "int8"}
+
+_EMBEDDER: Optional[SentenceTransformer] = None
+_CROSS_ENCODER: Optional[CrossEncoder] = None
+_LOAD_LOCK = threading.Lock()
+_THREADS_CONFIGURED = False
+
+
+def physical_cores() -> int:
+    if psutil is not None:
+        cores = psutil.cpu_count(logical=False)
+        if cores:
+            return cores
+    # os.cpu_count() counts SMT siblings; assume two per core when psutil is missing.
+    logical = os.cpu_count() or 1
+    return max(logical // 2, 1)
+
+
+def inference_threads() -> int:
+    if settings.inference_threads > 0:
+        return settings.inference_threads
+    return physical_cores()
+
+
+def model_threads() -> Dict[str, int]:
+    # Per-session ONNX Runtime pools. Background ingestion (embedder) and live queries
+    # (reranker) run concurrently and each session owns its pool, so the budget is split:
+    # the reranker gets half, rounded down, since its batches are small, and the
+    # embedder gets the rest.
+    budget = inference_threads()
+    rerank = max(budget // 2, 1)
+    embed = max(budget - rerank, 1)
+    return {"embedder": embed, "reranker": rerank}
+
+
+def configure_threads() -> None:
+    # torch sizes its intra-op pool per calling thread, so there is nothing to split:
+    # keep torch's default (physical cores) unless INFERENCE_THREADS asks for a budget.
+    global _THREADS_CONFIGURED
+    if _THREADS_CONFIGURED:
+        return
+    if settings.inference_threads > 0:
+        torch.set_num_threads(settings.inference_threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        # Only settable before torch runs any parallel work.
+        pass
+    _THREADS_CONFIGURED = True
+
+
+def _check_backend(backend: str) -> None:
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend {backend!r}. Use one of: {', '.join(sorted(BACKENDS))}.")
+    if backend == "onnx" and onnxruntime is None:
+        raise RuntimeError("ONNX backend requested but onnxruntime is missing. Install optimum[onnxruntime].")
+
+
+def _onnx_model_kwargs(threads: int) -> Dict[str, Any]:
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = threads
+    options.inter_op_num_threads = 1
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return {"provider": "CPUExecutionProvider", "session_options": options}
+
+
+def _quantize_int8(module: torch.nn.Module) -> None:
+    torch.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def load_embedder(backend: Optional[str] = None, max_seq_length: Optional[int] = None) -> SentenceTransformer:
+    # max_seq_length: None uses INFERENCE_MAX_SEQ_LENGTH, 0 keeps the model's native limit.
+    backend = backend or settings.inference_backend
+    max_seq_length = settings.inference_max_seq_length if max_seq_length is None else max_seq_length
+    _check_backend(backend)
+    configure_threads()
+    if backend == "onnx":
+        model = SentenceTransformer(
+            settings.embedding_model,
+            device="cpu",
+            backend="onnx",
+            model_kwargs=_onnx_model_kwargs(model_threads()["embedder"]),
+        )
+    else:
+        model = SentenceTransformer(settings.embedding_model, device="cpu")
+        if backend == "int8":
+            _quantize_int8(model)
+    model.eval()
+    if max_seq_length > 0:
+        model.max_seq_length = max_seq_length
+    return model
+
+
+def load_cross_encoder(backend: Optional[str] = None, max_seq_length: Optional[int] = None) -> CrossEncoder:
+    # max_seq_length: None uses INFERENCE_MAX_SEQ_LENGTH, 0 keeps the model's native limit.
+    backend = backend or settings.inference_backend
+    _check_backend(backend)
+    configure_threads()
+    max_seq_length = settings.inference_max_seq_length if max_seq_length is None else max_seq_length
+    max_length = max_seq_length or None
+    if backend == "onnx":
+        model = CrossEncoder(
+            settings.rerank_model,
+            device="cpu",
+            max_length=max_length,
+            backend="onnx",
+            model_kwargs=_onnx_model_kwargs(model_threads()["reranker"]),
+        )
+    else:
+        model = CrossEncoder(settings.rerank_model, device="cpu", max_length=max_length)
+        if backend == "int8":
+            _quantize_int8(model.model)
+    return model
+
+
+def get_embedder() -> SentenceTransformer:
+    global _EMBEDDER
+    with _LOAD_LOCK:
+        if _EMBEDDER is None:
+            _EMBEDDER = load_embedder()
+    return _EMBEDDER
+
+
+def get_cross_encoder() -> CrossEncoder:
+    global _CROSS_ENCODER
+    with _LOAD_LOCK:
+        if _CROSS_ENCODER is None:
+            _CROSS_ENCODER = load_cross_encoder()
+    return _CROSS_ENCODER
+
+
+def predict_pairs(model: CrossEncoder, pairs: List[List[str]], batch_size: int = 32) -> np.ndarray:
+    # Batches are padded to their longest pair, so scoring pairs in length order keeps
+    # padding (and wasted compute) to a minimum. Scores are returned in input order.
+    if not pairs:
+        return np.zeros(0, dtype=np.float32)
+    order = sorted(range(len(pairs)), key=lambda i: len(pairs[i][0]) + len(pairs[i][1]))
+    sorted_scores = model.predict([pairs[i] for i in order], batch_size=batch_size, show_progress_bar=False)
+    scores = np.empty(len(pairs), dtype=np.float32)
+    scores[order] = np.asarray(sorted_scores, dtype=np.float32)
+    return scores
+
+
+class SentenceTransformerEmbeddings(Embeddings):
+    # LangChain adapter so Chroma reuses the shared embedder instead of loading its own copy.
+    # Embeddings are left unnormalized to match the HuggingFaceEmbeddings defaults.
+
+    def __init__(self, model: Optional[SentenceTransformer] = None) -> None:
+        self.model = model or get_embedder()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.model.encode(texts, show_progress_bar=False).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.model.encode(text, show_progress_bar=False).tolist()
+
+
+def ranking_swaps(reference: np.ndarray, candidate: np.ndarray, score_tolerance: float) -> int:
+    # Pairs ordered differently by the two models, ignoring near-ties in the reference.
+    swaps = 0
+    for i in range(len(reference)):
+        for j in range(i + 1, len(reference)):
+            ref_diff = reference[i] - reference[j]
+            if abs(ref_diff) <= score_tolerance:
+                continue
+            if np.sign(ref_diff) != np.sign(candidate[i] - candidate[j]):
+                swaps += 1
+    return swaps
+
+
+def check_parity(
+    texts: List[str],
+    query: str,
+    backend: Optional[str] = None,
+    min_cosine: float = 0.99,
+    score_tolerance: float = 0.1,
+    top_n: int = 5,
+) -> Dict[str, Any]:
+    # Compare the configured backend against the float32 torch reference models, which
+    # run at the models' native sequence length so truncation differences show up too.
+    backend = backend or settings.inference_backend
+    reference_embedder = load_embedder("torch", max_seq_length=0)
+    candidate_embedder = load_embedder(backend)
+    ref = reference_embedder.encode(texts, normalize_embeddings=True, show_progress_bar=False)
+    cand = candidate_embedder.encode(texts, normalize_embeddings=True, show_progress_bar=False)
+    cosines = (ref * cand).sum(axis=1)
+
+    pairs = [[query, t] for t in texts]
+    ref_scores = predict_pairs(load_cross_encoder("torch", max_seq_length=0), pairs)
+    cand_scores = predict_pairs(load_cross_encoder(backend), pairs)
+    ref_top = [int(i) for i in np.argsort(-ref_scores)[:top_n]]
+    cand_top = [int(i) for i in np.argsort(-cand_scores)[:top_n]]
+    swaps = ranking_swaps(ref_scores, cand_scores, score_tolerance)
+
+    min_cos = float(cosines.min()) if len(cosines) else 1.0
+    return {
+        "backend": backend,
+        "min_embedding_cosine": min_cos,
+        "max_score_diff": float(np.abs(ref_scores - cand_scores).max()) if len(pairs) else 0.0,
+        "reference_top": ref_top,
+        "candidate_top": cand_top,
+        "ranking_swaps": swaps,
+        "embeddings_match": min_cos >= min_cosine,
+        "ranking_match": swaps == 0,
+    }
@@ -1,13 +1,13 @@
 import os
 import re
-import pickle
+import json
+import hashlib
 from dataclasses import dataclass
-from typing import Iterable, List, Dict, Tuple
+from typing import Callable, Iterator, List, Dict, Optional, Tuple
 
 from pypdf import PdfReader
 from sentence_transformers import SentenceTransformer
 from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import HuggingFaceEmbeddings
 
 try:
     import pytesseract
@@ -17,10 +17,28 @@ except Exception:  # pragma: no cover - optional OCR dependency
     Image = None
 
 from .config import settings
+from .dedup import MAX_LISTED_SOURCES, DedupStats, MinHasher, band_keys, estimated_jaccard, format_source
+from .inference import SentenceTransformerEmbeddings, get_embedder
+from .index_versions import (
+    IndexPaths,
+    VersionLock,
+    create_staging_version,
+    pending_versions,
+    publish_version,
+    version_paths,
+)
+from .sparse_store import SparseStore, file_fingerprint
 
 
 SENTENCE_SPLIT_REGEX = re.compile(r"(?<=[.!?])\s+")
 
+TEXT_EXTENSIONS = {".txt", ".md"}
+PDF_EXTENSIONS = {".pdf"}
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".bmp", ".tiff"}
+
+# progress(done, total, message)
+ProgressCallback = Callable[[int, int, str], None]
+
 
 @dataclass
 class Chunk:
@@ -33,15 +51,6 @@ def read_text_file(path: str) -> str:
         return f.read()
 
 
-def read_pdf(path: str) -> List[Tuple[int, str]]:
-    reader = PdfReader(path)
-    pages = []
-    for i, page in enumerate(reader.pages):
-        text = page.extract_text() or ""
-        pages.append((i + 1, text))
-    return pages
-
-
 def read_image_text(path: str) -> str:
     if pytesseract is None or Image is None:
         raise RuntimeError("OCR dependencies missing. Install pytesseract and pillow.")
@@ -98,54 +107,281 @@ def build_chunks_from_text(text: str, metadata: Dict, embedder: SentenceTransfor
     return [Chunk(text=c, metadata={**metadata, "chunk_index": i}) for i, c in enumerate(chunks)]
 
 
-def load_documents(source_dir: str) -> List[Chunk]:
-    embedder = SentenceTransformer(settings.embedding_model)
-    all_chunks: List[Chunk] = []
-
+def list_source_files(source_dir: str) -> List[str]:
+    supported = TEXT_EXTENSIONS | PDF_EXTENSIONS | IMAGE_EXTENSIONS
+    paths = []
     for root, _, files in os.walk(source_dir):
         for name in files:
-            path = os.path.join(root, name)
-            ext = os.path.splitext(name)[1].lower()
-            if ext in {".txt", ".md"}:
-                text = read_text_file(path)
-                meta = {"source": path, "page": None}
-                all_chunks.extend(build_chunks_from_text(text, meta, embedder))
-            elif ext == ".pdf":
-                for page_num, page_text in read_pdf(path):
-                    meta = {"source": path, "page": page_num}
-                    all_chunks.extend(build_chunks_from_text(page_text, meta, embedder))
-            elif ext in {".png", ".jpg", ".jpeg", ".bmp", ".tiff"}:
-                text = read_image_text(path)
-                meta = {"source": path, "page": None, "ocr": True}
-                all_chunks.extend(build_chunks_from_text(text, meta, embedder))
-
-    return all_chunks
-
-
-def persist_indexes(chunks: List[Chunk]) -> None:
-    os.makedirs(settings.chroma_dir, exist_ok=True)
-    texts = [c.text for c in chunks]
-    metadatas = [c.metadata for c in chunks]
-
-    embedding_fn = HuggingFaceEmbeddings(model_name=settings.embedding_model)
-    vectorstore = Chroma.from_texts(
-        texts=texts,
-        embedding=embedding_fn,
-        metadatas=metadatas,
-        persist_directory=settings.chroma_dir,
-    )
-    vectorstore.persist()
-
-    bm25_data = {
-        "texts": texts,
-        "metadatas": metadatas,
-    }
-    os.makedirs(os.path.dirname(settings.bm25_index_path), exist_ok=True)
-    with open(settings.bm25_index_path, "wb") as f:
-        pickle.dump(bm25_data, f)
-
-
-def ingest(source_dir: str) -> int:
-    chunks = load_documents(source_dir)
-    persist_indexes(chunks)
-    return len(chunks)
+            if os.path.splitext(name)[1].lower() in supported:
+                paths.append(os.path.join(root, name))
+    return paths
+
+
+def iter_file_chunks(path: str, embedder: SentenceTransformer) -> Iterator[Chunk]:
+    # Yields chunks page by page so a large PDF is never held in memory as a whole.
+    ext = os.path.splitext(path)[1].lower()
+    if ext in TEXT_EXTENSIONS:
+        text = read_text_file(path)
+        meta = {"source": path, "page": None}
+        yield from build_chunks_from_text(text, meta, embedder)
+    elif ext in PDF_EXTENSIONS:
+        reader = PdfReader(path)
+        for i, page in enumerate(reader.pages):
+            meta = {"source": path, "page": i + 1}
+            yield from build_chunks_from_text(page.extract_text() or "", meta, embedder)
+    elif ext in IMAGE_EXTENSIONS:
+        text = read_image_text(path)
+        meta = {"source": path, "page": None, "ocr": True}
+        yield from build_chunks_from_text(text, meta, embedder)
+
+
+def load_file(path: str, embedder: SentenceTransformer) -> List[Chunk]:
+    return list(iter_file_chunks(path, embedder))
+
+
+def chunk_id(chunk: Chunk) -> str:
+    # Deterministic, so a batch replayed after a crash upserts instead of duplicating.
+    meta = chunk.metadata
+    key = f"{meta.get('source')}|{meta.get('page')}|{meta.get('chunk_index')}|{chunk.text}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+class IndexWriter:
+    # Streams chunks into the dense (Chroma) and sparse (SQLite) indexes of one version
+    # in fixed-size batches. Near-duplicates are collapsed on the fly against the LSH
+    # buckets stored with the sparse index, so the first copy seen becomes canonical.
+
+    def __init__(self, paths: IndexPaths, batch_size: Optional[int] = None) -> None:
+        os.makedirs(paths.chroma_dir, exist_ok=True)
+        self.store = SparseStore(paths.bm25_index_path)
+        self.embedding_fn = SentenceTransformerEmbeddings()
+        self.vectorstore = Chroma(
+            embedding_function=self.embedding_fn,
+            persist_directory=paths.chroma_dir,
+        )
+        self.hasher = MinHasher() if settings.dedup_enabled else None
+        self.batch_size = batch_size or settings.ingest_batch_size
+        # New chunks waiting for the next Chroma write, and metadata changes to chunks
+        # Chroma already has.
+        self._pending: Dict[str, Chunk] = {}
+        self._updates: Dict[str, Dict] = {}
+
+    def add(self, chunk: Chunk) -> None:
+        cid = chunk_id(chunk)
+        signature = keys = None
+        if self.hasher is not None:
+            signature = self.hasher.signature(chunk.text)
+            keys = band_keys(signature)
+            canonical = self._find_duplicate(signature, keys)
+            if canonical is not None:
+                self._merge_source(canonical, chunk.metadata)
+                self._maybe_flush()
+                return
+        self.store.add_chunk(cid, chunk.text, chunk.metadata, signature, keys)
+        self.store.add_source(cid, format_source(chunk.metadata))
+        self._pending[cid] = chunk
+        self._maybe_flush()
+
+    def _find_duplicate(self, signature, keys: List[bytes]) -> Optional[str]:
+        for candidate, candidate_signature in self.store.candidates(keys):
+            if estimated_jaccard(signature, candidate_signature) >= settings.dedup_threshold:
+                return candidate
+        return None
+
+    def _merge_source(self, canonical: str, metadata: Dict) -> None:
+        if not self.store.add_source(canonical, format_source(metadata)):
+            return
+        meta = self.store.get_metadata(canonical) or {}
+        count = int(meta.get("duplicate_count") or 1) + 1
+        if count <= MAX_LISTED_SOURCES:
+            self._refresh_sources(canonical, meta, count)
+        else:
+            # The preview is already full; only the total changes.
+            self._set_metadata(canonical, {**meta, "duplicate_count": count})
+
+    def _refresh_sources(self, canonical: str, meta: Dict, count: Optional[int] = None) -> None:
+        # Rebuild the capped source preview kept in metadata from the membership table.
+        count = self.store.count_sources(canonical) if count is None else count
+        meta = {k: v for k, v in meta.items() if k not in {"sources", "duplicate_count"}}
+        if count > 1:
+            preview = self.store.sources_of(canonical, MAX_LISTED_SOURCES)
+            meta.update({"sources": json.dumps(preview), "duplicate_count": count})
+        self._set_metadata(canonical, meta)
+
+    def _set_metadata(self, canonical: str, meta: Dict) -> None:
+        self.store.update_metadata(canonical, meta)
+        if canonical in self._pending:
+            self._pending[canonical] = Chunk(text=self._pending[canonical].text, metadata=meta)
+        else:
+            self._updates[canonical] = meta
+
+    def _maybe_flush(self) -> None:
+        if len(self._pending) + len(self._updates) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        # SQLite is committed before Chroma is written, so everything Chroma holds for a
+        # file that is not yet marked done (new chunks, and sources merged into earlier
+        # chunks) is already recorded in SQLite, where discard_file can find and undo it.
+        self.store.commit()
+        self._write_chroma()
+
+    def _write_chroma(self) -> None:
+        # Upserts, so a batch written again after a crash overwrites what Chroma has.
+        if self._pending:
+            texts = [c.text for c in self._pending.values()]
+            self.vectorstore._collection.upsert(
+                ids=list(self._pending),
+                documents=texts,
+                metadatas=[c.metadata for c in self._pending.values()],
+                embeddings=self.embedding_fn.embed_documents(texts),
+            )
+        if self._updates:
+            # The LangChain wrapper re-embeds on update; metadata alone goes to the collection.
+            self.vectorstore._collection.update(ids=list(self._updates), metadatas=list(self._updates.values()))
+        self._pending = {}
+        self._updates = {}
+
+    def discard_file(self, path: str) -> None:
+        # Undo an interrupted pass over ``path``: its chunks, their LSH entries and the
+        # sources it contributed to earlier canonical chunks. Chroma is repaired from the
+        # uncommitted SQLite state before that state is committed, so a crash here just
+        # leaves the file unfinished and the next run repeats the whole discard.
+        self.flush()
+        touched = self.store.chunks_citing(path)
+        self.vectorstore._collection.delete(where={"source": path})
+        own = set(self.store.delete_source(path))
+        self.store.delete_sources_from(path)
+        for canonical in touched:
+            if canonical not in own:
+                self._refresh_sources(canonical, self.store.get_metadata(canonical) or {})
+        self._write_chroma()
+        self.store.forget_file(path)
+        self.store.commit()
+
+    def start_file(self, path: str) -> None:
+        self.store.mark_file_started(path)
+        self.store.commit()
+
+    def finish_file(self, path: str, chunks: int, size_bytes: int) -> None:
+        # Only mark the file done once Chroma has all of it.
+        self.flush()
+        self.store.mark_file_done(path, chunks, size_bytes)
+        self.store.commit()
+
+    def dedup_stats(self) -> DedupStats:
+        before, after, clusters, bytes_before, bytes_after = self.store.dedup_totals()
+        return DedupStats(
+            chunks_before=before,
+            chunks_after=after,
+            clusters=clusters,
+            bytes_before=bytes_before,
+            bytes_after=bytes_after,
+        )
+
+    def close(self) -> None:
+        self.store.close()
+
+
+def write_report(path: str, report: Dict) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+
+def read_report(path: Optional[str]) -> Optional[Dict]:
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def is_resumable(version_dir: str, source_dir: str) -> bool:
+    # An unpublished build of the same source tree can be resumed as long as none of
+    # the files it already completed changed or disappeared since. Files it only
+    # started are discarded and re-read.
+    store_path = version_paths(version_dir).bm25_index_path
+    if not os.path.exists(store_path):
+        return False
+    with SparseStore(store_path) as store:
+        if store.get_meta("source_dir") != os.path.abspath(source_dir):
+            return False
+        completed = store.completed_files()
+    return all(os.path.exists(p) and file_fingerprint(p) == fp for p, fp in completed.items())
+
+
+def claim_build_version(source_dir: str) -> Tuple[str, VersionLock]:
+    # Resume the newest interrupted build of ``source_dir`` that no other process is
+    # writing to, or start a new one. The returned lock is held until publishing.
+    for version_dir in reversed(pending_versions()):
+        lock = VersionLock(version_dir)
+        if not lock.acquire():
+            continue
+        if is_resumable(version_dir, source_dir):
+            return version_dir, lock
+        lock.release()
+    version_dir = create_staging_version()
+    lock = VersionLock(version_dir)
+    lock.acquire(blocking=True)
+    return version_dir, lock
+
+
+def ingest(source_dir: str, progress: Optional[ProgressCallback] = None) -> int:
+    paths = list_source_files(source_dir)
+    # One extra step for finalizing the version.
+    total = len(paths) + 1
+
+    # Build into a staging version so live queries keep reading the published one.
+    # An interrupted build is left in place and picked up again by the next run.
+    staging_dir, lock = claim_build_version(source_dir)
+    try:
+        index_paths = version_paths(staging_dir)
+        writer = IndexWriter(index_paths)
+        try:
+            writer.store.set_meta("source_dir", os.path.abspath(source_dir))
+            writer.store.commit()
+            # Drop partial output from an interrupted run before anything new can be
+            # collapsed into it; those files are re-read from scratch below.
+            for path in writer.store.unfinished_files():
+                writer.discard_file(path)
+            completed = writer.store.completed_files()
+            embedder = get_embedder()
+
+            for i, path in enumerate(paths):
+                name = os.path.basename(path)
+                if completed.get(path) == file_fingerprint(path):
+                    if progress:
+                        progress(i, total, f"Skipping {name} (already ingested)")
+                    continue
+                if progress:
+                    progress(i, total, f"Reading {name}")
+                writer.start_file(path)
+                count = size_bytes = 0
+                for chunk in iter_file_chunks(path, embedder):
+                    writer.add(chunk)
+                    count += 1
+                    size_bytes += len(chunk.text.encode("utf-8"))
+                writer.finish_file(path, count, size_bytes)
+
+            stats = writer.dedup_stats()
+            chunks = stats.chunks_after
+            report: Dict = {"files": len(paths), "chunks": chunks}
+            if settings.dedup_enabled:
+                report["dedup"] = stats.to_dict()
+                if progress:
+                    progress(
+                        len(paths),
+                        total,
+                        f"Collapsed {stats.duplicates_removed} near-duplicate chunks "
+                        f"({stats.savings_ratio:.0%} smaller index)",
+                    )
+            write_report(index_paths.report_path, report)
+        finally:
+            writer.close()
+
+        publish_version(staging_dir)
+    finally:
+        lock.release()
+
+    if progress:
+        progress(total, total, f"Published {os.path.basename(staging_dir)} with {chunks} chunks")
+    return chunks
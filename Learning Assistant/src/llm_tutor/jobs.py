@@ -0,0 +1,72 @@
+import threading
+import time
+import traceback
+import uuid
+from dataclasses import dataclass, field
+from typing import Optional
+
+from .ingestion import ingest
+
+
+@dataclass
+class IngestJob:
+    source_dir: str
+    job_id: str = field(default_factory=lambda: uuid.uuid4().hex[:8])
+    status: str = "pending"  # pending, running, done, failed
+    done: int = 0
+    total: int = 0
+    message: str = ""
+    chunks: int = 0
+    error: Optional[str] = None
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        return self.status in {"pending", "running"}
+
+    @property
+    def fraction(self) -> float:
+        if self.status == "done":
+            return 1.0
+        if not self.total:
+            return 0.0
+        return min(self.done / self.total, 1.0)
+
+    def report(self, done: int, total: int, message: str) -> None:
+        self.done = done
+        self.total = total
+        self.message = message
+
+    def run(self) -> None:
+        self.status = "running"
+        self.started_at = time.time()
+        try:
+            self.chunks = ingest(self.source_dir, progress=self.report)
+            self.status = "done"
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {str(e)}"
+            self.message = traceback.format_exc(limit=3)
+            self.status = "failed"
+        finally:
+            self.finished_at = time.time()
+
+
+_JOB: Optional[IngestJob] = None
+_JOB_LOCK = threading.Lock()
+
+
+def current_job() -> Optional[IngestJob]:
+    return _JOB
+
+
+def start_ingest_job(source_dir: str) -> IngestJob:
+    # One ingestion per process; a second request returns the job already in flight.
+    global _JOB
+    with _JOB_LOCK:
+        if _JOB is not None and _JOB.running:
+            return _JOB
+        _JOB = IngestJob(source_dir=source_dir)
+        thread = threading.Thread(target=_JOB.run, name=f"ingest-{_JOB.job_id}", daemon=True)
+        thread.start()
+        return _JOB
@@ -8,6 +8,7 @@ from langchain_core.documents import Document
 import requests
 
 from .config import settings
+from .dedup import other_sources_label
 from .classify import llm_classify, heuristic_classify
 from .retrieval import hybrid_retrieve
 from .rerank import CrossEncoderReranker
@@ -35,7 +36,11 @@ def format_context(docs: List[Document]) -> str:
         meta = d.metadata or {}
         source = meta.get("source", "unknown")
         page = meta.get("page", "")
-        lines.append(f"[{i}] {d.page_content}\nSource: {source} Page: {page}")
+        line = f"[{i}] {d.page_content}\nSource: {source} Page: {page}"
+        others = other_sources_label(meta)
+        if others:
+            line += f"\nAlso in: {others}"
+        lines.append(line)
     return "\n\n".join(lines)
 
 
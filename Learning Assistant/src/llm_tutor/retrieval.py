@@ -1,35 +1,47 @@
 import os
 import pickle
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
 from rank_bm25 import BM25Okapi
 from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_core.documents import Document
 
 from .config import settings
+from .dedup import unique_indices
+from .inference import SentenceTransformerEmbeddings
+from .index_versions import IndexPaths, active_paths
+from .sparse_store import SparseStore
 
 
 def tokenize(text: str) -> List[str]:
     return text.lower().split()
 
 
-def load_bm25() -> Tuple[BM25Okapi, List[str], List[dict]]:
-    if not os.path.exists(settings.bm25_index_path):
+def load_bm25(paths: Optional[IndexPaths] = None) -> Tuple[BM25Okapi, List[str], List[dict]]:
+    bm25_index_path = (paths or active_paths()).bm25_index_path
+    if not os.path.exists(bm25_index_path):
         raise FileNotFoundError("BM25 index not found. Run ingestion first.")
-    with open(settings.bm25_index_path, "rb") as f:
-        data = pickle.load(f)
-    texts = data["texts"]
-    metadatas = data["metadatas"]
+    if bm25_index_path.endswith(".sqlite"):
+        texts, metadatas = [], []
+        with SparseStore(bm25_index_path) as store:
+            for text, metadata in store.iter_chunks():
+                texts.append(text)
+                metadatas.append(metadata)
+    else:
+        # Legacy single-pickle index from before streaming ingestion.
+        with open(bm25_index_path, "rb") as f:
+            data = pickle.load(f)
+        texts = data["texts"]
+        metadatas = data["metadatas"]
     tokenized = [tokenize(t) for t in texts]
     return BM25Okapi(tokenized), texts, metadatas
 
 
-def load_vectorstore() -> Chroma:
-    embedding_fn = HuggingFaceEmbeddings(model_name=settings.embedding_model)
+def load_vectorstore(paths: Optional[IndexPaths] = None) -> Chroma:
+    embedding_fn = SentenceTransformerEmbeddings()
     return Chroma(
         embedding_function=embedding_fn,
-        persist_directory=settings.chroma_dir,
+        persist_directory=(paths or active_paths()).chroma_dir,
     )
 
 
@@ -80,12 +92,18 @@ def rrf_fusion(
 
 
 def hybrid_retrieve(query: str, top_k: int) -> List[Document]:
-    vectorstore = load_vectorstore()
-    bm25, sparse_texts, sparse_metas = load_bm25()
+    # Resolve the published version once so both indexes come from the same build.
+    paths = active_paths()
+    vectorstore = load_vectorstore(paths)
+    bm25, sparse_texts, sparse_metas = load_bm25(paths)
 
     dense = vectorstore.similarity_search_with_score(query, k=top_k)
     sparse_scores = bm25.get_scores(tokenize(query))
     sparse_ranked = sorted(enumerate(sparse_scores), key=lambda x: x[1], reverse=True)[:top_k]
 
     fused = rrf_fusion(dense, sparse_ranked, sparse_texts, sparse_metas, k=settings.rrf_k)
+    if settings.dedup_enabled:
+        # Indexes built before dedup (or copies below the ingest threshold) can still
+        # surface the same passage twice; keep the best-ranked copy only.
+        fused = [fused[i] for i in unique_indices([d.page_content for d in fused])]
     return fused[:top_k]
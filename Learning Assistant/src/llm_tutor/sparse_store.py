@@ -0,0 +1,204 @@
+import json
+import os
+import sqlite3
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    id TEXT PRIMARY KEY,
+    text TEXT NOT NULL,
+    metadata TEXT NOT NULL,
+    signature BLOB
+);
+CREATE TABLE IF NOT EXISTS lsh (
+    band INTEGER NOT NULL,
+    key BLOB NOT NULL,
+    chunk_id TEXT NOT NULL,
+    PRIMARY KEY (band, key, chunk_id)
+);
+CREATE TABLE IF NOT EXISTS chunk_sources (
+    chunk_id TEXT NOT NULL,
+    source TEXT NOT NULL,
+    PRIMARY KEY (chunk_id, source)
+);
+CREATE INDEX IF NOT EXISTS chunk_sources_by_source ON chunk_sources (source);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    chunks INTEGER NOT NULL,
+    bytes INTEGER NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def _like_prefix(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def file_fingerprint(path: str) -> Tuple[int, float]:
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime
+
+
+class SparseStore:
+    # On-disk chunk store behind the BM25 index. It also holds the LSH buckets used for
+    # incremental near-duplicate lookups, the full source membership of each chunk and the per-file ingestion checkpoints: a file is
+    # recorded as started before its first chunk and as done in the same transaction as
+    # its last one.
+
+    def __init__(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "SparseStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def commit(self) -> None:
+        self.conn.commit()
+
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def add_chunk(
+        self,
+        chunk_id: str,
+        text: str,
+        metadata: Dict,
+        signature: Optional[np.ndarray] = None,
+        band_keys: Optional[List[bytes]] = None,
+    ) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO chunks (id, text, metadata, signature) VALUES (?, ?, ?, ?)",
+            (chunk_id, text, json.dumps(metadata), signature.tobytes() if signature is not None else None),
+        )
+        if band_keys:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO lsh (band, key, chunk_id) VALUES (?, ?, ?)",
+                [(band, key, chunk_id) for band, key in enumerate(band_keys)],
+            )
+
+    def get_metadata(self, chunk_id: str) -> Optional[Dict]:
+        row = self.conn.execute("SELECT metadata FROM chunks WHERE id = ?", (chunk_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def update_metadata(self, chunk_id: str, metadata: Dict) -> None:
+        self.conn.execute("UPDATE chunks SET metadata = ? WHERE id = ?", (json.dumps(metadata), chunk_id))
+
+    def add_source(self, chunk_id: str, source: str) -> bool:
+        # True if ``source`` was not yet recorded for the chunk.
+        cursor = self.conn.execute(
+            "INSERT OR IGNORE INTO chunk_sources (chunk_id, source) VALUES (?, ?)", (chunk_id, source)
+        )
+        return cursor.rowcount == 1
+
+    def sources_of(self, chunk_id: str, limit: int) -> List[str]:
+        rows = self.conn.execute(
+            "SELECT source FROM chunk_sources WHERE chunk_id = ? ORDER BY rowid LIMIT ?", (chunk_id, limit)
+        )
+        return [row[0] for row in rows]
+
+    def count_sources(self, chunk_id: str) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM chunk_sources WHERE chunk_id = ?", (chunk_id,)).fetchone()[0]
+
+    def chunks_citing(self, path: str) -> List[str]:
+        # Chunks listing ``path`` (or one of its pages) among their sources.
+        rows = self.conn.execute(
+            "SELECT DISTINCT chunk_id FROM chunk_sources WHERE source = ? OR source LIKE ? ESCAPE '\\'",
+            (path, _like_prefix(path) + "#page=%"),
+        )
+        return [row[0] for row in rows]
+
+    def delete_sources_from(self, path: str) -> None:
+        self.conn.execute(
+            "DELETE FROM chunk_sources WHERE source = ? OR source LIKE ? ESCAPE '\\'",
+            (path, _like_prefix(path) + "#page=%"),
+        )
+
+    def candidates(self, band_keys: List[bytes]) -> Iterator[Tuple[str, np.ndarray]]:
+        # Chunks sharing at least one LSH band with the given signature.
+        seen = set()
+        for band, key in enumerate(band_keys):
+            rows = self.conn.execute(
+                "SELECT c.id, c.signature FROM lsh l JOIN chunks c ON c.id = l.chunk_id "
+                "WHERE l.band = ? AND l.key = ?",
+                (band, key),
+            )
+            for chunk_id, signature in rows:
+                if chunk_id in seen or signature is None:
+                    continue
+                seen.add(chunk_id)
+                yield chunk_id, np.frombuffer(signature, dtype=np.uint64)
+
+    def completed_files(self) -> Dict[str, Tuple[int, float]]:
+        rows = self.conn.execute("SELECT path, size, mtime FROM files WHERE done = 1")
+        return {path: (size, mtime) for path, size, mtime in rows}
+
+    def unfinished_files(self) -> List[str]:
+        return [row[0] for row in self.conn.execute("SELECT path FROM files WHERE done = 0")]
+
+    def mark_file_started(self, path: str) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO files (path, size, mtime, chunks, bytes, done) VALUES (?, 0, 0, 0, 0, 0)",
+            (path,),
+        )
+
+    def mark_file_done(self, path: str, chunks: int, size_bytes: int) -> None:
+        size, mtime = file_fingerprint(path)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO files (path, size, mtime, chunks, bytes, done) VALUES (?, ?, ?, ?, ?, 1)",
+            (path, size, mtime, chunks, size_bytes),
+        )
+
+    def forget_file(self, path: str) -> None:
+        self.conn.execute("DELETE FROM files WHERE path = ?", (path,))
+
+    def delete_source(self, source: str) -> List[str]:
+        # Drops every chunk read from ``source`` along with its LSH entries.
+        ids = [
+            row[0]
+            for row in self.conn.execute(
+                "SELECT id FROM chunks WHERE json_extract(metadata, '$.source') = ?", (source,)
+            )
+        ]
+        for chunk_id in ids:
+            self.conn.execute("DELETE FROM lsh WHERE chunk_id = ?", (chunk_id,))
+            self.conn.execute("DELETE FROM chunk_sources WHERE chunk_id = ?", (chunk_id,))
+            self.conn.execute("DELETE FROM chunks WHERE id = ?", (chunk_id,))
+        return ids
+
+    def dedup_totals(self) -> Tuple[int, int, int, int, int]:
+        # (chunks_before, chunks_after, clusters, bytes_before, bytes_after)
+        before, bytes_before = self.conn.execute(
+            "SELECT COALESCE(SUM(chunks), 0), COALESCE(SUM(bytes), 0) FROM files"
+        ).fetchone()
+        after, bytes_after, clusters = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(CAST(text AS BLOB))), 0), "
+            "COALESCE(SUM(json_extract(metadata, '$.duplicate_count') > 1), 0) FROM chunks"
+        ).fetchone()
+        return before, after, clusters, bytes_before, bytes_after
+
+    def iter_chunks(self) -> Iterator[Tuple[str, Dict]]:
+        for text, metadata in self.conn.execute("SELECT text, metadata FROM chunks ORDER BY rowid"):
+            yield text, json.loads(metadata)
@@ -5,7 +5,10 @@ import requests
 
 from src.llm_tutor.config import settings
 from src.llm_tutor.rag import answer_question
-from src.llm_tutor.ingestion import ingest
+from src.llm_tutor.dedup import other_sources_label
+from src.llm_tutor.index_versions import active_paths, current_version
+from src.llm_tutor.ingestion import read_report
+from src.llm_tutor.jobs import current_job, start_ingest_job
 
 
 st.set_page_config(page_title="Local LLM Tutor", page_icon="📚", layout="wide")
@@ -87,7 +90,8 @@ CUSTOM_CSS = """
 st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
 
 def indexes_ready() -> bool:
-    return os.path.exists(settings.bm25_index_path) and os.path.exists(settings.chroma_dir)
+    paths = active_paths()
+    return os.path.exists(paths.bm25_index_path) and os.path.exists(paths.chroma_dir)
 
 
 def ollama_status() -> str:
@@ -100,11 +104,35 @@ def ollama_status() -> str:
         return "unreachable"
 
 
+index_paths = active_paths()
 index_ready = indexes_ready()
 ollama_state = ollama_status()
 upload_dir = Path("./data/source/uploads")
 upload_dir.mkdir(parents=True, exist_ok=True)
 
+
+@st.fragment(run_every=1)
+def ingest_progress() -> None:
+    # Polls the background ingestion job without blocking the rest of the page.
+    job = current_job()
+    if job is None:
+        return
+    if job.running:
+        st.progress(job.fraction, text=job.message or "Starting ingestion...")
+        st.caption("Queries are served from the current index until the new version is published.")
+        return
+    if st.session_state.get("seen_ingest_job") != job.job_id:
+        # Rerun the whole app once so the status panel picks up the new index version.
+        st.session_state["seen_ingest_job"] = job.job_id
+        if job.status == "done":
+            st.session_state["last_ingest"] = job.chunks
+        st.rerun()
+    if job.status == "done":
+        st.success(f"Ingested {job.chunks} chunks.")
+    else:
+        st.error(f"Ingestion failed: {job.error}")
+
+
 if "history" not in st.session_state:
         st.session_state.history = []
 
@@ -113,14 +141,22 @@ with st.sidebar:
         st.markdown(
                 f"<div class='card'>"
                 f"<div class='stat'><span class='label'>Vector DB</span>"
-                f"<span class='pill {'ok' if os.path.exists(settings.chroma_dir) else 'bad'}'>"
-                f"{'Ready' if os.path.exists(settings.chroma_dir) else 'Missing'}</span></div>"
+                f"<span class='pill {'ok' if os.path.exists(index_paths.chroma_dir) else 'bad'}'>"
+                f"{'Ready' if os.path.exists(index_paths.chroma_dir) else 'Missing'}</span></div>"
                 f"<div class='stat' style='margin-top:8px;'><span class='label'>BM25 Index</span>"
-                f"<span class='pill {'ok' if os.path.exists(settings.bm25_index_path) else 'bad'}'>"
-                f"{'Ready' if os.path.exists(settings.bm25_index_path) else 'Missing'}</span></div>"
+                f"<span class='pill {'ok' if os.path.exists(index_paths.bm25_index_path) else 'bad'}'>"
+                f"{'Ready' if os.path.exists(index_paths.bm25_index_path) else 'Missing'}</span></div>"
+                f"<div class='stat' style='margin-top:8px;'><span class='label'>Index version</span>"
+                f"<span class='pill'>{current_version() or 'legacy'}</span></div>"
                 f"</div>",
                 unsafe_allow_html=True,
         )
+        dedup_report = (read_report(index_paths.report_path) or {}).get("dedup")
+        if dedup_report:
+            st.caption(
+                f"Deduplication removed {dedup_report['duplicates_removed']} of "
+                f"{dedup_report['chunks_before']} chunks ({dedup_report['savings_ratio']:.0%})."
+            )
         st.markdown("### 🧠 Model")
         st.write(settings.ollama_model)
         st.write("Base URL:", settings.ollama_base_url)
@@ -139,12 +175,12 @@ with st.sidebar:
                 target = upload_dir / file.name
                 target.write_bytes(file.getbuffer())
             st.success(f"Saved {len(uploaded)} file(s) to uploads.")
-        if st.button("Ingest uploads", use_container_width=True):
-            with st.spinner("Indexing uploads..."):
-                count = ingest("./data/source")
-            st.success(f"Ingested {count} chunks.")
-            st.session_state["last_ingest"] = count
+        job = current_job()
+        job_running = job is not None and job.running
+        if st.button("Ingest uploads", use_container_width=True, disabled=job_running):
+            start_ingest_job("./data/source")
             st.rerun()
+        ingest_progress()
 
         st.markdown("### ⚡ Performance")
         fast_mode = st.toggle("Fast mode", value=True)
@@ -231,6 +267,9 @@ if submit and query:
             meta = doc.metadata or {}
             with st.expander(f"[{i}] {meta.get('source', 'unknown')} (Page {meta.get('page', '-')})"):
                 st.write(doc.page_content)
+                others = other_sources_label(meta)
+                if others:
+                    st.caption(f"Also in: {others}")
 
 if st.session_state.history:
     st.subheader("Conversation")